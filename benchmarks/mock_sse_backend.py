@@ -5,119 +5,227 @@ Emits configurable SSE chunks with tunable latency to stress-test ccr-rust's
 streaming proxy without requiring real API keys or burning tokens.
 
 Usage:
-    uv run python benchmarks/mock_sse_backend.py [--port 9999] [--chunks 20] [--delay-ms 50]
+    uv run python benchmarks/mock_sse_backend.py [--port 9999] [--chunks 20] [--delay-ms 50] [--batch-size 1]
 """
 
 from __future__ import annotations
 
 import argparse
 import asyncio
-import json
 import time
+from collections.abc import Awaitable, Callable
+from typing import Any
 
+import orjson
 import uvicorn
-from starlette.applications import Starlette
-from starlette.requests import Request
-from starlette.responses import StreamingResponse
-from starlette.routing import Route
+
+Scope = dict[str, Any]
+Message = dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+TEXT_HEADERS = [(b"content-type", b"text/plain; charset=utf-8")]
 
 DEFAULT_PORT = 9999
 DEFAULT_CHUNKS = 20
 DEFAULT_DELAY_MS = 50
+DEFAULT_BATCH_SIZE = 1
+
+
+# One OpenAI chat.completion.chunk frame, byte-for-byte as orjson would emit it.
+# Slots: chunk index, created stamp, JSON-escaped content fragment.
+SSE_CHUNK_TEMPLATE = (
+    b'data: {"id":"chatcmpl-mock-%d","object":"chat.completion.chunk","created":%d,'
+    b'"model":"mock-model","choices":[{"index":0,"delta":{"content":"%b"},'
+    b'"finish_reason":null}]}\n\n'
+)
 
 
-def make_sse_chunk(index: int, text: str) -> str:
+def encode_fragment(text: str) -> bytes:
+    """JSON-escape text for splicing into a string slot (no surrounding quotes)."""
+    return orjson.dumps(text)[1:-1]
+
+
+def make_sse_chunk(index: int, fragment: bytes, created: int) -> bytes:
     """Format a single SSE data line matching Anthropic/OpenAI streaming format."""
-    payload = {
-        "id": f"chatcmpl-mock-{index}",
-        "object": "chat.completion.chunk",
-        "created": int(time.time()),
+    return SSE_CHUNK_TEMPLATE % (index, created, fragment)
+
+
+# Complete non-streaming response, encoded once. "created" is a placeholder
+# stamped by build_app.
+BATCH_RESPONSE = orjson.dumps(
+    {
+        "id": "chatcmpl-mock-batch",
+        "object": "chat.completion",
+        "created": 0,
         "model": "mock-model",
         "choices": [
             {
                 "index": 0,
-                "delta": {"content": text},
-                "finish_reason": None,
+                "message": {"role": "assistant", "content": "Hello from mock backend."},
+                "finish_reason": "stop",
             }
         ],
+        "usage": {
+            "input_tokens": 10,
+            "output_tokens": 5,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0,
+        },
     }
-    return f"data: {json.dumps(payload)}\n\n"
+)
 
 
-def make_final_chunk() -> str:
+def make_final_chunk() -> bytes:
     """The terminal [DONE] sentinel."""
-    return "data: [DONE]\n\n"
+    return b"data: [DONE]\n\n"
+
+
+async def read_body(receive: Receive) -> bytes:
+    """Collect the full HTTP request body from ASGI receive events."""
+    message = await receive()
+    body = message.get("body", b"")
+    if not message.get("more_body", False):
+        return body
+    parts = [body]
+    while message.get("more_body", False):
+        message = await receive()
+        parts.append(message.get("body", b""))
+    return b"".join(parts)
+
+
+async def send_response(send: Send, status: int, headers: list[tuple[bytes, bytes]], body: bytes) -> None:
+    """Send a complete single-body HTTP response."""
+    if not any(name == b"content-length" for name, _ in headers):
+        headers = [*headers, (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def wait_for_disconnect(receive: Receive) -> None:
+    """Return once the client disconnects; the request body is already read."""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
 
+async def serve_lifespan(receive: Receive, send: Send) -> None:
+    """Acknowledge ASGI lifespan events; the mock has no startup work."""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
 
-def build_app(chunks: int, delay_ms: int) -> Starlette:
-    """Build the Starlette ASGI app with the given streaming parameters."""
 
-    delay_s = delay_ms / 1000.0
+def build_app(chunks: int, delay_ms: int, batch_size: int = DEFAULT_BATCH_SIZE) -> ASGIApp:
+    """Build the raw ASGI app with the given streaming parameters.
+
+    The mock only serves two fixed routes, so it dispatches on the request
+    path directly instead of going through a framework router.
+
+    With ``batch_size`` > 1, that many SSE frames are coalesced into a single
+    write, and each write is followed by the delay of the frames it carries,
+    so the stream duration stays ``chunks * delay_ms``.
+    """
+
+    batch_size = max(batch_size, 1)
+    chunk_delay_s = delay_ms / 1000.0
     words = [
         "The", "quick", "brown", "fox", "jumps", "over", "the", "lazy", "dog.",
         "Pack", "my", "box", "with", "five", "dozen", "liquor", "jugs.",
         "How", "vexingly", "quick", "daft", "zebras", "jump.",
     ]
 
-    async def chat_completions(request: Request) -> StreamingResponse:
-        body = await request.json()
+    # Every response has the same shape, so encode the bodies once at startup.
+    # The created stamp is sampled once here; the proxy treats it as opaque.
+    created = int(time.time())
+    batch_body = BATCH_RESPONSE.replace(b'"created":0', b'"created":%d' % created, 1)
+    encoded_words = [encode_fragment(w + " ") for w in words]
+    frames = [
+        make_sse_chunk(i, encoded_words[i % len(encoded_words)], created) for i in range(chunks)
+    ]
+    # (write, delay after it) pairs; a short last batch only waits for its own frames.
+    precomputed = []
+    for i in range(0, chunks, batch_size):
+        batch = frames[i:i + batch_size]
+        precomputed.append((b"".join(batch), len(batch) * chunk_delay_s))
+    final = make_final_chunk()
+
+    json_headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(batch_body)).encode()),
+    ]
+    sse_headers = [
+        (b"content-type", b"text/event-stream; charset=utf-8"),
+        (b"cache-control", b"no-cache"),
+        (b"connection", b"keep-alive"),
+        (b"x-mock-chunks", str(chunks).encode()),
+        (b"x-mock-delay-ms", str(delay_ms).encode()),
+        (b"x-mock-batch-size", str(batch_size).encode()),
+    ]
+
+    async def chat_completions(receive: Receive, send: Send) -> None:
+        body = orjson.loads(await read_body(receive))
         is_stream = body.get("stream", False)
 
         if not is_stream:
-            # Non-streaming: return a complete response
-            response = {
-                "id": "chatcmpl-mock-batch",
-                "object": "chat.completion",
-                "created": int(time.time()),
-                "model": "mock-model",
-                "choices": [
-                    {
-                        "index": 0,
-                        "message": {"role": "assistant", "content": "Hello from mock backend."},
-                        "finish_reason": "stop",
-                    }
-                ],
-                "usage": {
-                    "input_tokens": 10,
-                    "output_tokens": 5,
-                    "cache_read_input_tokens": 0,
-                    "cache_creation_input_tokens": 0,
-                },
-            }
-            return StreamingResponse(
-                iter([json.dumps(response)]),
-                media_type="application/json",
-                status_code=200,
-            )
-
-        # Streaming: emit SSE chunks with delay
-        async def generate():
-            for i in range(chunks):
-                word = words[i % len(words)]
-                yield make_sse_chunk(i, word + " ")
-                await asyncio.sleep(delay_s)
-            yield make_final_chunk()
-
-        return StreamingResponse(
-            generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Mock-Chunks": str(chunks),
-                "X-Mock-Delay-Ms": str(delay_ms),
-            },
-        )
-
-    async def health(request: Request) -> StreamingResponse:
-        return StreamingResponse(iter(["ok"]), media_type="text/plain")
-
-    routes = [
-        Route("/chat/completions", chat_completions, methods=["POST"]),
-        Route("/health", health, methods=["GET"]),
-    ]
+            # Non-streaming: return the complete response
+            await send_response(send, 200, json_headers, batch_body)
+            return
+
+        # Streaming: emit SSE chunks with delay, and stop as soon as the client
+        # goes away (uvicorn silently drops sends after a disconnect).
+        await send({"type": "http.response.start", "status": 200, "headers": sse_headers})
+        stream = asyncio.ensure_future(stream_chunks(send))
+        watcher = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            await asyncio.wait((stream, watcher), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stream.cancel()
+            watcher.cancel()
+            await asyncio.gather(stream, watcher, return_exceptions=True)
+        if not stream.cancelled():
+            stream.result()
+
+    async def stream_chunks(send: Send) -> None:
+        # Sleep to absolute deadlines so scheduling lag does not compound
+        # across chunks and skew the measured stream duration.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        for buf, delay_s in precomputed:
+            await send({"type": "http.response.body", "body": buf, "more_body": True})
+            deadline += delay_s
+            remaining = deadline - loop.time()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+        await send({"type": "http.response.body", "body": final, "more_body": False})
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await serve_lifespan(receive, send)
+            return
+
+        path = scope["path"]
+        method = scope["method"]
+        if path == "/chat/completions":
+            if method == "POST":
+                await chat_completions(receive, send)
+            else:
+                await send_response(send, 405, TEXT_HEADERS, b"Method Not Allowed")
+        elif path == "/health":
+            if method in ("GET", "HEAD"):
+                await send_response(send, 200, TEXT_HEADERS, b"ok")
+            else:
+                await send_response(send, 405, TEXT_HEADERS, b"Method Not Allowed")
+        else:
+            await send_response(send, 404, TEXT_HEADERS, b"Not Found")
 
-    return Starlette(routes=routes)
+    return app
 
 
 def main() -> None:
@@ -125,16 +233,31 @@ def main() -> None:
     parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Listen port")
     parser.add_argument("--chunks", type=int, default=DEFAULT_CHUNKS, help="SSE chunks per response")
     parser.add_argument("--delay-ms", type=int, default=DEFAULT_DELAY_MS, help="Delay between chunks (ms)")
+    parser.add_argument(
+        "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="SSE chunks coalesced per write"
+    )
     parser.add_argument("--host", default="127.0.0.1", help="Listen address")
     args = parser.parse_args()
 
-    app = build_app(args.chunks, args.delay_ms)
+    app = build_app(args.chunks, args.delay_ms, args.batch_size)
 
     print(f"Mock SSE backend starting on {args.host}:{args.port}")
-    print(f"  chunks={args.chunks}, delay={args.delay_ms}ms per chunk")
+    print(f"  chunks={args.chunks}, delay={args.delay_ms}ms per chunk, batch={args.batch_size}")
     print(f"  Total stream duration per request: ~{args.chunks * args.delay_ms}ms")
 
-    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    # uvloop + httptools keep per-connection CPU on the mock low, and a deep
+    # accept backlog stops a burst of concurrent connects from being dropped.
+    uvicorn.run(
+        app,
+        host=args.host,
+        port=args.port,
+        loop="uvloop",
+        http="httptools",
+        workers=1,
+        backlog=4096,
+        access_log=False,
+        log_level="warning",
+    )
 
 
 if __name__ == "__main__":
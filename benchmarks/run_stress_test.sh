@@ -6,11 +6,11 @@
 #
 # Usage:
 #   cd contrib/ccr-rust
-#   ./benchmarks/run_stress_test.sh [--streams 100] [--chunks 20] [--delay-ms 50]
+#   ./benchmarks/run_stress_test.sh [--streams 100] [--chunks 20] [--delay-ms 50] [--batch-size 1]
 #
 # Requirements:
 #   - ccr-rust binary built: cargo build --release
-#   - Python deps: uv pip install aiohttp uvicorn starlette
+#   - Python deps: uv pip install aiohttp numpy 'uvicorn[standard]' orjson
 
 set -euo pipefail
 
@@ -22,6 +22,7 @@ REPO_ROOT="$(cd "$PROJECT_DIR/../.." && pwd)"
 STREAMS=100
 CHUNKS=20
 DELAY_MS=50
+BATCH_SIZE=1
 RAMP_MS=0
 MOCK_PORT=9999
 CCR_PORT=3456
@@ -33,6 +34,7 @@ while [[ $# -gt 0 ]]; do
         --streams)   STREAMS="$2"; shift 2 ;;
         --chunks)    CHUNKS="$2"; shift 2 ;;
         --delay-ms)  DELAY_MS="$2"; shift 2 ;;
+        --batch-size) BATCH_SIZE="$2"; shift 2 ;;
         --ramp-ms)   RAMP_MS="$2"; shift 2 ;;
         --mock-port) MOCK_PORT="$2"; shift 2 ;;
         --ccr-port)  CCR_PORT="$2"; shift 2 ;;
@@ -93,6 +95,7 @@ echo "============================================================"
 echo "  Streams:    $STREAMS"
 echo "  Chunks:     $CHUNKS per stream"
 echo "  Delay:      ${DELAY_MS}ms between chunks"
+echo "  Batch size: $BATCH_SIZE chunks per write"
 echo "  Ramp:       ${RAMP_MS}ms"
 echo "  Mock port:  $MOCK_PORT"
 echo "  CCR port:   $CCR_PORT"
@@ -102,7 +105,7 @@ echo ""
 # 1. Start mock backend
 echo "[1/3] Starting mock SSE backend on port $MOCK_PORT..."
 (cd "$REPO_ROOT" && uv run python "$SCRIPT_DIR/mock_sse_backend.py" \
-    --port "$MOCK_PORT" --chunks "$CHUNKS" --delay-ms "$DELAY_MS") &
+    --port "$MOCK_PORT" --chunks "$CHUNKS" --delay-ms "$DELAY_MS" --batch-size "$BATCH_SIZE") &
 PIDS+=($!)
 sleep 1
 
@@ -26,14 +26,28 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-import json
 import sys
 import time
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field
 from typing import Any
 
+import aiohttp
+import numpy as np
+import orjson
 
-@dataclass
+
+# Linear interpolation between closest ranks; the 1.0 quantile is the max.
+QUANTILES = (0.50, 0.95, 0.99, 1.0)
+
+# Interval between /v1/usage polls while streams are running.
+POLL_INTERVAL_S = 0.25
+
+# Per-request timeouts for the usage poller and the post-test usage fetch.
+POLL_TIMEOUT = aiohttp.ClientTimeout(total=2)
+FINAL_USAGE_TIMEOUT = aiohttp.ClientTimeout(total=5)
+
+
+@dataclass(slots=True)
 class StreamResult:
     stream_id: int
     status_code: int = 0
@@ -46,7 +60,7 @@ class StreamResult:
     last_chunk_ts: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class StressReport:
     total_streams: int = 0
     successful: int = 0
@@ -69,16 +83,36 @@ class StressReport:
     ccr_usage: dict[str, Any] | None = None
 
 
-def percentile(data: list[float], pct: float) -> float:
-    """Compute the pct-th percentile of a sorted list."""
-    if not data:
-        return 0.0
-    k = (len(data) - 1) * (pct / 100.0)
-    f = int(k)
-    c = f + 1
-    if c >= len(data):
-        return data[f]
-    return data[f] + (k - f) * (data[c] - data[f])
+def slots_dict(obj: Any) -> dict[str, Any]:
+    """Shallow field dict of a slotted dataclass; avoids the deepcopy done by dataclasses.asdict."""
+    return {f: getattr(obj, f) for f in obj.__slots__}
+
+
+class ConcurrencyGauge:
+    """In-flight stream counter that records the peak at the moment of entry.
+
+    The event loop is single-threaded, so plain int updates need no lock.
+    """
+
+    __slots__ = ("cur", "peak")
+
+    def __init__(self) -> None:
+        self.cur = 0
+        self.peak = 0
+
+    def inc(self) -> None:
+        self.cur += 1
+        if self.cur > self.peak:
+            self.peak = self.cur
+
+    def dec(self) -> None:
+        self.cur -= 1
+
+
+def latency_stats(samples: np.ndarray) -> tuple[float, float, float, float]:
+    """Return (p50, p95, p99, max) of the samples in a single quantile pass."""
+    p50, p95, p99, peak = np.quantile(samples, QUANTILES).tolist()
+    return p50, p95, p99, peak
 
 
 def build_request_body(model: str, max_tokens: int, stream_id: int) -> dict:
@@ -97,50 +131,53 @@ def build_request_body(model: str, max_tokens: int, stream_id: int) -> dict:
 
 
 async def consume_sse_stream(
-    session_module: object,
+    session: aiohttp.ClientSession,
     ccr_url: str,
     model: str,
     max_tokens: int,
     stream_id: int,
-    timeout: float,
-    concurrent_gauge: list[int],
+    gauge: ConcurrencyGauge,
 ) -> StreamResult:
-    """Open a single SSE stream and consume it, recording metrics."""
-    import aiohttp
-
+    """Open a single SSE stream on the shared session and consume it, recording metrics."""
     result = StreamResult(stream_id=stream_id)
     url = f"{ccr_url}/v1/messages"
     body = build_request_body(model, max_tokens, stream_id)
 
-    t0 = time.monotonic()
-    concurrent_gauge[0] += 1
+    # Per-chunk counters live in locals and are written back once on exit.
+    get_time = time.monotonic
+    chunks = 0
+    nbytes = 0
+    last = 0.0
+
+    t0 = get_time()
+    gauge.inc()
 
     try:
-        client_timeout = aiohttp.ClientTimeout(total=timeout)
-        async with aiohttp.ClientSession(timeout=client_timeout) as session:
-            async with session.post(
-                url,
-                json=body,
-                headers={"Content-Type": "application/json"},
-            ) as resp:
-                result.status_code = resp.status
-
-                if resp.status != 200:
-                    text = await resp.text()
-                    result.error = f"HTTP {resp.status}: {text[:200]}"
-                    return result
-
-                first_byte = True
-                async for chunk in resp.content.iter_any():
-                    now = time.monotonic()
-                    if first_byte:
-                        result.ttfb_ms = (now - t0) * 1000.0
-                        result.first_chunk_ts = now
-                        first_byte = False
-
-                    result.chunks_received += 1
-                    result.bytes_received += len(chunk)
-                    result.last_chunk_ts = now
+        async with session.post(
+            url,
+            json=body,
+            headers={"Content-Type": "application/json"},
+        ) as resp:
+            result.status_code = resp.status
+
+            if resp.status != 200:
+                text = await resp.text()
+                result.error = f"HTTP {resp.status}: {text[:200]}"
+                return result
+
+            # Only the first chunk is timestamped inside the loop; the end of
+            # the stream is stamped once after the body is drained.
+            first_byte = True
+            async for chunk in resp.content.iter_any():
+                if first_byte:
+                    now = get_time()
+                    result.ttfb_ms = (now - t0) * 1000.0
+                    result.first_chunk_ts = now
+                    first_byte = False
+
+                chunks += 1
+                nbytes += len(chunk)
+            last = get_time()
 
     except TimeoutError:
         result.error = "timeout"
@@ -149,46 +186,55 @@ async def consume_sse_stream(
     except Exception as e:
         result.error = f"{type(e).__name__}: {e}"
     finally:
-        result.duration_ms = (time.monotonic() - t0) * 1000.0
-        concurrent_gauge[0] -= 1
+        result.duration_ms = (get_time() - t0) * 1000.0
+        result.chunks_received = chunks
+        result.bytes_received = nbytes
+        result.last_chunk_ts = last
+        gauge.dec()
 
     return result
 
 
-async def poll_active_streams(ccr_url: str, peak: list[float], stop_event: asyncio.Event) -> None:
-    """Periodically poll ccr-rust /v1/usage to track peak active_streams gauge."""
-    import aiohttp
-
+async def poll_active_streams(
+    session: aiohttp.ClientSession,
+    ccr_url: str,
+    stop_event: asyncio.Event,
+) -> float:
+    """Periodically poll ccr-rust /v1/usage and return the peak active_streams gauge."""
     url = f"{ccr_url}/v1/usage"
-    while not stop_event.is_set():
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=2)) as resp:
+    peak = 0.0
+    # A single stop waiter raced against each interval sleep, so shutdown
+    # wakes the poller immediately instead of waiting out the interval.
+    stop_wait = asyncio.ensure_future(stop_event.wait())
+    try:
+        while not stop_event.is_set():
+            try:
+                async with session.get(url, timeout=POLL_TIMEOUT) as resp:
                     if resp.status == 200:
-                        data = await resp.json()
-                        current = data.get("active_streams", 0)
-                        if current > peak[0]:
-                            peak[0] = current
-        except Exception:
-            pass
-        try:
-            await asyncio.wait_for(stop_event.wait(), timeout=0.25)
-        except TimeoutError:
-            pass
-
-
-async def fetch_final_usage(ccr_url: str) -> dict | None:
-    """Fetch final usage stats from ccr-rust after the test."""
-    import aiohttp
+                        data = await resp.json(loads=orjson.loads)
+                        # A missing key falls through to the except below.
+                        current = data["active_streams"]
+                        if current > peak:
+                            peak = current
+            except Exception:
+                pass
+            sleep_task = asyncio.ensure_future(asyncio.sleep(POLL_INTERVAL_S))
+            await asyncio.wait({sleep_task, stop_wait}, return_when=asyncio.FIRST_COMPLETED)
+            sleep_task.cancel()
+    finally:
+        stop_wait.cancel()
+    return peak
 
+
+async def fetch_final_usage(session: aiohttp.ClientSession, ccr_url: str) -> dict | None:
+    """Fetch final usage stats from ccr-rust after the test."""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{ccr_url}/v1/usage",
-                timeout=aiohttp.ClientTimeout(total=5),
-            ) as resp:
-                if resp.status == 200:
-                    return await resp.json()
+        async with session.get(
+            f"{ccr_url}/v1/usage",
+            timeout=FINAL_USAGE_TIMEOUT,
+        ) as resp:
+            if resp.status == 200:
+                return await resp.json(loads=orjson.loads)
     except Exception:
         pass
     return None
@@ -203,45 +249,60 @@ async def run_stress_test(
     max_tokens: int,
 ) -> tuple[list[StreamResult], StressReport]:
     """Launch all streams concurrently and collect results."""
-
-    concurrent_gauge: list[int] = [0]
-    peak_concurrent: list[int] = [0]
-    peak_active_streams: list[float] = [0.0]
+    # One pooled session for every stream plus the usage poller, so kept-alive
+    # connections are reused instead of paying a TCP handshake per stream.
+    # ccr-rust serves HTTP/1.1 only, so each live stream needs its own socket;
+    # idle sockets are kept for the whole run so ramped launches reuse them.
+    connector = aiohttp.TCPConnector(
+        limit=streams * 2,
+        limit_per_host=streams * 2,
+        ttl_dns_cache=300,
+        keepalive_timeout=timeout,
+    )
+    async with aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as session:
+        return await _run_streams(session, ccr_url, streams, ramp_ms, model, max_tokens)
+
+
+async def _run_streams(
+    session: aiohttp.ClientSession,
+    ccr_url: str,
+    streams: int,
+    ramp_ms: int,
+    model: str,
+    max_tokens: int,
+) -> tuple[list[StreamResult], StressReport]:
+    """Drive all streams over the shared session and build the report."""
+    gauge = ConcurrencyGauge()
 
     stop_poll = asyncio.Event()
-    poll_task = asyncio.create_task(poll_active_streams(ccr_url, peak_active_streams, stop_poll))
+    poll_task = asyncio.create_task(poll_active_streams(session, ccr_url, stop_poll))
 
     ramp_delay = ramp_ms / 1000.0 / max(streams, 1)
 
-    async def launch_stream(sid: int) -> StreamResult:
-        if ramp_delay > 0 and sid > 0:
-            await asyncio.sleep(ramp_delay * sid)
+    results: list[StreamResult | None] = [None] * streams
 
-        # Track peak concurrency
-        r = await consume_sse_stream(
-            None, ccr_url, model, max_tokens, sid, timeout, concurrent_gauge
-        )
-        current = concurrent_gauge[0]
-        if current > peak_concurrent[0]:
-            peak_concurrent[0] = current
-        return r
+    async def launch_stream(sid: int) -> None:
+        results[sid] = await consume_sse_stream(session, ccr_url, model, max_tokens, sid, gauge)
 
+    # Issue streams from a producer that sleeps between launches, so only
+    # started streams hold a task frame during the ramp.
     wall_t0 = time.monotonic()
-    tasks = [asyncio.create_task(launch_stream(i)) for i in range(streams)]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    async with asyncio.TaskGroup() as tg:
+        for i in range(streams):
+            tg.create_task(launch_stream(i))
+            if ramp_delay > 0 and i < streams - 1:
+                await asyncio.sleep(ramp_delay)
     wall_elapsed = time.monotonic() - wall_t0
 
-    # Stop the poller
+    # Stop the poller and collect the peak it observed
     stop_poll.set()
-    await poll_task
+    ccr_peak = await poll_task
 
-    # Convert exceptions to error results
-    processed: list[StreamResult] = []
-    for i, r in enumerate(results):
-        if isinstance(r, Exception):
-            processed.append(StreamResult(stream_id=i, error=f"{type(r).__name__}: {r}"))
-        else:
-            processed.append(r)
+    # consume_sse_stream records its own errors, so every slot is filled.
+    processed = [r for r in results if r is not None]
 
     # Build report
     report = StressReport(total_streams=streams, wall_clock_s=wall_elapsed)
@@ -257,30 +318,36 @@ async def run_stress_test(
         report.errors[key] = report.errors.get(key, 0) + 1
 
     if successes:
-        ttfbs = sorted(r.ttfb_ms for r in successes)
-        durations = sorted(r.duration_ms for r in successes)
-
-        report.ttfb_p50_ms = percentile(ttfbs, 50)
-        report.ttfb_p95_ms = percentile(ttfbs, 95)
-        report.ttfb_p99_ms = percentile(ttfbs, 99)
-        report.ttfb_max_ms = ttfbs[-1]
-
-        report.duration_p50_ms = percentile(durations, 50)
-        report.duration_p95_ms = percentile(durations, 95)
-        report.duration_p99_ms = percentile(durations, 99)
-        report.duration_max_ms = durations[-1]
-
-        report.total_bytes = sum(r.bytes_received for r in successes)
-        report.total_chunks = sum(r.chunks_received for r in successes)
+        n = len(successes)
+        ttfbs = np.fromiter((r.ttfb_ms for r in successes), dtype=np.float64, count=n)
+        durations = np.fromiter((r.duration_ms for r in successes), dtype=np.float64, count=n)
+        nbytes = np.fromiter((r.bytes_received for r in successes), dtype=np.int64, count=n)
+        nchunks = np.fromiter((r.chunks_received for r in successes), dtype=np.int64, count=n)
+
+        (
+            report.ttfb_p50_ms,
+            report.ttfb_p95_ms,
+            report.ttfb_p99_ms,
+            report.ttfb_max_ms,
+        ) = latency_stats(ttfbs)
+        (
+            report.duration_p50_ms,
+            report.duration_p95_ms,
+            report.duration_p99_ms,
+            report.duration_max_ms,
+        ) = latency_stats(durations)
+
+        report.total_bytes = int(nbytes.sum())
+        report.total_chunks = int(nchunks.sum())
 
         if wall_elapsed > 0:
             report.throughput_mbps = (report.total_bytes * 8) / (wall_elapsed * 1_000_000)
 
-    report.peak_concurrent = peak_concurrent[0]
-    report.ccr_active_streams_peak = peak_active_streams[0]
+    report.peak_concurrent = gauge.peak
+    report.ccr_active_streams_peak = ccr_peak
 
     # Fetch final CCR usage
-    report.ccr_usage = await fetch_final_usage(ccr_url)
+    report.ccr_usage = await fetch_final_usage(session, ccr_url)
 
     return processed, report
 
@@ -368,11 +435,11 @@ def main() -> None:
 
     if args.json_out:
         output = {
-            "report": asdict(report),
-            "streams": [asdict(r) for r in results],
+            "report": slots_dict(report),
+            "streams": [slots_dict(r) for r in results],
         }
-        with open(args.json_out, "w") as f:
-            json.dump(output, f, indent=2)
+        with open(args.json_out, "wb") as f:
+            f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
         print(f"JSON results written to {args.json_out}")
 
     # Exit code: 0 if all passed, 1 if >5% failed, 2 if >50% failed
@@ -6,23 +6,42 @@ Runs a live probe across configured provider routes and validates:
 - /v1/responses (stream=false and stream=true)
 
 Streaming validation checks SSE framing and JSON payload parseability.
-The script exits non-zero if any probe fails.
+All probes run concurrently over one aiohttp session (bounded by
+--concurrency). The script exits non-zero if any probe fails.
+
+Requires Python 3.11+ with aiohttp and orjson:
+    pip install aiohttp orjson
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
+import functools
+import hashlib
 import json
-import subprocess
+import os
 import sys
 import time
-from collections.abc import Iterable
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import aclosing
 from dataclasses import dataclass
+from pathlib import Path
+
+try:
+    import aiohttp
+    import orjson
+except ImportError as exc:
+    sys.exit(f"{exc}; the smoke test needs aiohttp and orjson: pip install aiohttp orjson")
+
+# How long discovered /v1/models routes are reused from the disk cache.
+MODELS_CACHE_TTL_S = 24 * 60 * 60
 
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
-        description="CCR multi-provider smoke matrix")
+        description="CCR multi-provider smoke matrix",
+        epilog="Requires Python 3.11+ with aiohttp and orjson (pip install aiohttp orjson).")
     parser.add_argument(
         "--base-url",
         default="http://127.0.0.1:3456",
@@ -60,7 +79,40 @@ def build_parser() -> argparse.ArgumentParser:
         "--models",
         default="",
         help="Comma-separated provider routes to test (e.g. zai,glm-5;deepseek,deepseek-chat). "
-        "If omitted, routes are discovered from /v1/models.",
+        "If omitted, routes are discovered from /v1/models (cached for 24h under "
+        "~/.cache/ccr_smoke).",
+    )
+    parser.add_argument(
+        "--refresh-models",
+        action="store_true",
+        help="Ignore a fresh models cache and re-run /v1/models discovery.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Maximum probes in flight at once (default: 8)",
+    )
+    parser.add_argument(
+        "--cases",
+        type=parse_cases_arg,
+        default=",".join(PROBE_CASES),
+        help="Comma-separated cases to run per route, from: "
+        f"{', '.join(PROBE_CASES)} (default: all)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard_arg,
+        default=None,
+        metavar="I/N",
+        help="Run only shard I of N (1-based), e.g. 2/4. The route x case matrix is split "
+        "into N contiguous, near-equal blocks in route order. A shard with no checks "
+        "(N larger than the matrix) passes with 0/0.",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="Stop and cancel the remaining probes after the first failure.",
     )
     parser.add_argument(
         "--verbose",
@@ -70,73 +122,82 @@ def build_parser() -> argparse.ArgumentParser:
     return parser
 
 
-def run_curl(
+async def http_post(
+    session: aiohttp.ClientSession,
     url: str,
-    payload: dict,
+    body: bytes,
     api_key: str,
-    timeout_s: int,
-    streaming: bool,
 ) -> tuple[int, str, str]:
-    cmd: list[str] = [
-        "curl",
-        "-sS",
-        "-m",
-        str(timeout_s),
-        "-w",
-        "\nHTTP_STATUS:%{http_code}",
-    ]
-    if streaming:
-        cmd.append("-N")
-    cmd.extend(
-        [
-            "-H",
-            "content-type: application/json",
-            "-H",
-            f"authorization: Bearer {api_key}",
-            "-d",
-            json.dumps(payload),
-            url,
-        ]
-    )
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    stdout = proc.stdout or ""
-    stderr = proc.stderr or ""
+    """POST a serialized JSON body and return (status, body, transport error).
+
+    Transport failures are reported as status 0 with the error text, so a
+    dead route fails its probe instead of aborting the whole matrix.
+    """
+    headers = {
+        "content-type": "application/json",
+        "authorization": f"Bearer {api_key}",
+    }
+    try:
+        async with session.post(url, data=body, headers=headers) as resp:
+            text = (await resp.read()).decode("utf-8", errors="replace")
+            return resp.status, text, ""
+    except (aiohttp.ClientError, TimeoutError) as exc:
+        return 0, "", f"{type(exc).__name__}: {exc}"
 
-    if "\nHTTP_STATUS:" in stdout:
-        body, status_str = stdout.rsplit("\nHTTP_STATUS:", 1)
-        try:
-            status = int(status_str.strip())
-        except ValueError:
-            status = 0
-    else:
-        body = stdout
-        status = 0
-
-    return status, body, stderr
-
-
-def http_get_json(url: str, api_key: str, timeout_s: int) -> dict:
-    cmd = [
-        "curl",
-        "-sS",
-        "-m",
-        str(timeout_s),
-        "-H",
-        f"authorization: Bearer {api_key}",
-        url,
-    ]
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    if proc.returncode != 0:
-        raise RuntimeError(f"GET {url} failed: {proc.stderr.strip()}")
+
+class ProbeHttpError(Exception):
+    """Non-200 status (or transport failure as status 0) on a streaming probe."""
+
+    def __init__(self, status: int, detail: str) -> None:
+        super().__init__(f"HTTP {status}: {detail}")
+        self.status = status
+        self.detail = detail
+
+
+async def http_post_sse(
+    session: aiohttp.ClientSession,
+    url: str,
+    body: bytes,
+    api_key: str,
+) -> AsyncIterator[bytes]:
+    """POST a serialized JSON body and yield SSE event data as it arrives off the wire.
+
+    Raises ProbeHttpError for a non-200 status or a transport failure.
+    """
+    headers = {
+        "content-type": "application/json",
+        "authorization": f"Bearer {api_key}",
+    }
+    try:
+        async with session.post(url, data=body, headers=headers) as resp:
+            if resp.status != 200:
+                text = (await resp.read()).decode("utf-8", errors="replace")
+                raise ProbeHttpError(resp.status, text[:220])
+            decoder = SseDecoder()
+            async for chunk in resp.content.iter_any():
+                for data in decoder.feed(chunk):
+                    yield data
+            for data in decoder.flush():
+                yield data
+    except (aiohttp.ClientError, TimeoutError) as exc:
+        raise ProbeHttpError(0, f"{type(exc).__name__}: {exc}") from exc
+
+
+async def http_get_json(session: aiohttp.ClientSession, url: str, api_key: str) -> dict:
     try:
-        return json.loads(proc.stdout)
+        async with session.get(url, headers={"authorization": f"Bearer {api_key}"}) as resp:
+            raw = await resp.read()
+    except (aiohttp.ClientError, TimeoutError) as exc:
+        raise RuntimeError(f"GET {url} failed: {type(exc).__name__}: {exc}") from exc
+    try:
+        return json.loads(raw)
     except json.JSONDecodeError as exc:
         raise RuntimeError(f"GET {url} returned invalid JSON: {exc}") from exc
 
 
-def discover_models(base_url: str, api_key: str, timeout_s: int) -> list[str]:
+async def discover_models(session: aiohttp.ClientSession, base_url: str, api_key: str) -> list[str]:
     models_url = f"{base_url.rstrip('/')}/v1/models"
-    payload = http_get_json(models_url, api_key, timeout_s)
+    payload = await http_get_json(session, models_url, api_key)
     data = payload.get("data")
     if not isinstance(data, list):
         raise RuntimeError("Unexpected /v1/models payload: missing data array")
@@ -158,17 +219,213 @@ def discover_models(base_url: str, api_key: str, timeout_s: int) -> list[str]:
     return deduped
 
 
-def parse_sse_frames(raw: str) -> list[str]:
-    normalized = raw.replace("\r\n", "\n")
-    return [frame for frame in normalized.split("\n\n") if frame.strip()]
+async def warm_connection(session: aiohttp.ClientSession, base_url: str, api_key: str) -> None:
+    """Open a pooled keep-alive connection before the matrix starts.
+
+    Used when discovery did not hit the network, so the first probe does not
+    pay connection (and TLS) setup in its reported latency. Failures are
+    ignored; the probes themselves will report an unreachable CCR.
+    """
+    try:
+        async with session.head(
+            f"{base_url.rstrip('/')}/v1/models",
+            headers={"authorization": f"Bearer {api_key}"},
+        ) as resp:
+            await resp.read()
+    except (aiohttp.ClientError, TimeoutError):
+        pass
+
+
+def models_cache_dir(base_url: str, api_key: str) -> Path:
+    """Per-instance cache directory, keyed so multiple CCR instances don't collide."""
+    root = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    key = hashlib.md5(f"{base_url}\n{api_key}".encode(), usedforsecurity=False).hexdigest()[:16]
+    return root / "ccr_smoke" / key
+
+
+def read_models_cache(cache_dir: Path) -> tuple[list[str] | None, float | None]:
+    """Return (cached routes, age in seconds); (None, None) if absent or unreadable."""
+    try:
+        age = time.time() - (cache_dir / ".last_sync").stat().st_mtime
+        models = json.loads((cache_dir / "models.json").read_text())
+    except (OSError, ValueError):
+        return None, None
+    if not isinstance(models, list) or not all(isinstance(m, str) for m in models):
+        return None, None
+    return models, age
+
+
+def write_models_cache(cache_dir: Path, models: list[str]) -> None:
+    """Atomically replace the cached route list and touch the sync marker."""
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = cache_dir / "models.json.tmp"
+        tmp.write_text(json.dumps(models))
+        os.replace(tmp, cache_dir / "models.json")
+        marker_tmp = cache_dir / ".last_sync.tmp"
+        marker_tmp.write_text(str(int(time.time())))
+        os.replace(marker_tmp, cache_dir / ".last_sync")
+    except OSError as exc:
+        print(f"warning: could not write models cache: {exc}", file=sys.stderr)
+
+
+async def discover_models_cached(
+    session: aiohttp.ClientSession,
+    base_url: str,
+    api_key: str,
+    ttl_s: float,
+) -> tuple[list[str], float | None]:
+    """discover_models with a stale-while-revalidate disk cache.
+
+    A cache younger than ttl_s is used without touching the network. Otherwise
+    /v1/models is refetched; if that fails, a stale cache is used as fallback.
+    Returns (routes, cache age in seconds), with age None if /v1/models answered.
+    """
+    cache_dir = models_cache_dir(base_url, api_key)
+    cached, age = read_models_cache(cache_dir)
+    if cached and age is not None and age < ttl_s:
+        return cached, age
+
+    try:
+        models = await discover_models(session, base_url, api_key)
+    except RuntimeError as exc:
+        if not cached:
+            raise
+        print(f"warning: {exc}; using cached routes ({age:.0f}s old)", file=sys.stderr)
+        return cached, age
+
+    if models:
+        write_models_cache(cache_dir, models)
+    return models, None
+
+
+def format_age(age_s: float) -> str:
+    """Coarse human-readable age: 40s, 12m, 3h."""
+    if age_s < 60:
+        return f"{age_s:.0f}s"
+    if age_s < 60 * 60:
+        return f"{age_s / 60:.0f}m"
+    return f"{age_s / (60 * 60):.0f}h"
+
+
+class SseDecoder:
+    """Incremental SSE event decoder.
+
+    Raw bytes are fed as they arrive and scanned once, line by line: data:
+    lines are grouped and each event's payload is yielded on the blank line
+    that ends it (LF or CRLF). Only the current partial line is buffered,
+    never the whole body.
+    """
+
+    __slots__ = ("_buf", "_data")
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._data: list[bytes] = []
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        buf = self._buf
+        buf += chunk
+        i = 0
+        try:
+            while True:
+                j = buf.find(b"\n", i)
+                if j < 0:
+                    return
+                end = j - 1 if j > i and buf[j - 1] == 0x0D else j
+                if end == i:
+                    if self._data:
+                        data, self._data = self._data, []
+                        yield b"\n".join(data)
+                elif buf.startswith(b"data:", i):
+                    self._data.append(bytes(buf[i + 5:end]).lstrip())
+                i = j + 1
+        finally:
+            del buf[:i]
+
+    def flush(self) -> Iterator[bytes]:
+        """Yield a trailing event left without a closing blank line."""
+        tail = bytes(self._buf).rstrip(b"\r")
+        self._buf.clear()
+        if tail.startswith(b"data:"):
+            self._data.append(tail[5:].lstrip())
+        if self._data:
+            data, self._data = self._data, []
+            yield b"\n".join(data)
+
+
+@dataclass(frozen=True)
+class ProbeSettings:
+    api_key: str
+    prompt: str
+    max_tokens: int
+    temperature: float
+
+
+# Stand-in for the model id in cached payload templates. "model" is the first
+# key of every payload, so the first occurrence is always the model slot.
+MODEL_SLOT = "__ccr_smoke_model__"
+_MODEL_SLOT_JSON = orjson.dumps(MODEL_SLOT)
+
+PayloadTemplate = tuple[bytes, bytes]
+
+
+def split_model_slot(body: bytes) -> PayloadTemplate:
+    """Split a serialized body around the model slot into (head, tail)."""
+    head, _, tail = body.partition(_MODEL_SLOT_JSON)
+    return head, tail
+
+
+@functools.lru_cache(maxsize=8)
+def chat_payload_template(prompt: str, max_tokens: int, temperature: float, stream: bool) -> PayloadTemplate:
+    """Serialized /v1/chat/completions body, split around the model id."""
+    return split_model_slot(orjson.dumps(
+        {
+            "model": MODEL_SLOT,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "stream": stream,
+            "temperature": temperature,
+        }
+    ))
+
+
+@functools.lru_cache(maxsize=8)
+def responses_payload_template(prompt: str, max_tokens: int, stream: bool) -> PayloadTemplate:
+    """Serialized /v1/responses body, split around the model id."""
+    return split_model_slot(orjson.dumps(
+        {
+            "model": MODEL_SLOT,
+            "input": [
+                {
+                    "type": "message",
+                    "role": "user",
+                    "content": [{"type": "input_text", "text": prompt}],
+                }
+            ],
+            "max_output_tokens": max_tokens,
+            "stream": stream,
+        }
+    ))
+
+
+def render_payload(template: PayloadTemplate, model: str) -> bytes:
+    head, tail = template
+    return b"".join((head, orjson.dumps(model), tail))
+
+
+def build_chat_payload(model: str, settings: ProbeSettings, stream: bool) -> bytes:
+    return render_payload(
+        chat_payload_template(settings.prompt, settings.max_tokens, settings.temperature, stream),
+        model,
+    )
 
 
-def parse_sse_data(frame: str) -> str:
-    data_lines = []
-    for line in frame.split("\n"):
-        if line.startswith("data:"):
-            data_lines.append(line[5:].lstrip())
-    return "\n".join(data_lines)
+def build_responses_payload(model: str, settings: ProbeSettings, stream: bool) -> bytes:
+    return render_payload(
+        responses_payload_template(settings.prompt, settings.max_tokens, stream),
+        model,
+    )
 
 
 @dataclass
@@ -180,27 +437,16 @@ class ProbeResult:
     detail: str
 
 
-def run_chat_nonstream(
-    base_url: str,
+async def run_chat_nonstream(
+    session: aiohttp.ClientSession,
+    url: str,
     model: str,
-    api_key: str,
-    timeout_s: int,
-    prompt: str,
-    max_tokens: int,
-    temperature: float,
+    settings: ProbeSettings,
 ) -> ProbeResult:
-    url = f"{base_url.rstrip('/')}/v1/chat/completions"
-    payload = {
-        "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": max_tokens,
-        "stream": False,
-        "temperature": temperature,
-    }
-    start = time.time()
-    status, body, stderr = run_curl(
-        url, payload, api_key, timeout_s, streaming=False)
-    latency = time.time() - start
+    payload = build_chat_payload(model, settings, stream=False)
+    start = time.perf_counter()
+    status, body, stderr = await http_post(session, url, payload, settings.api_key)
+    latency = time.perf_counter() - start
 
     if status != 200:
         msg = stderr.strip() or body[:220]
@@ -230,46 +476,35 @@ def run_chat_nonstream(
     return ProbeResult(model, "chat/non-stream", True, latency, "ok")
 
 
-def run_chat_stream(
-    base_url: str,
+async def run_chat_stream(
+    session: aiohttp.ClientSession,
+    url: str,
     model: str,
-    api_key: str,
-    timeout_s: int,
-    prompt: str,
-    max_tokens: int,
-    temperature: float,
+    settings: ProbeSettings,
 ) -> ProbeResult:
-    url = f"{base_url.rstrip('/')}/v1/chat/completions"
-    payload = {
-        "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": max_tokens,
-        "stream": True,
-        "temperature": temperature,
-    }
-    start = time.time()
-    status, body, stderr = run_curl(
-        url, payload, api_key, timeout_s, streaming=True)
-    latency = time.time() - start
-
-    if status != 200:
-        msg = stderr.strip() or body[:220]
-        return ProbeResult(model, "chat/stream", False, latency, f"HTTP {status}: {msg}")
-
-    frames = parse_sse_frames(body)
+    payload = build_chat_payload(model, settings, stream=True)
+    frames = 0
     bad = 0
     done = 0
-    for frame in frames:
-        data = parse_sse_data(frame)
-        if not data:
-            continue
-        if data.strip() == "[DONE]":
-            done += 1
-            continue
-        try:
-            json.loads(data)
-        except json.JSONDecodeError:
-            bad += 1
+    start = time.perf_counter()
+    try:
+        async with aclosing(http_post_sse(session, url, payload, settings.api_key)) as stream:
+            async for data in stream:
+                frames += 1
+                if not data:
+                    continue
+                if data.strip() == b"[DONE]":
+                    # Terminator seen: stop reading rather than wait for close.
+                    done += 1
+                    break
+                try:
+                    orjson.loads(data)
+                except ValueError:
+                    bad += 1
+    except ProbeHttpError as exc:
+        latency = time.perf_counter() - start
+        return ProbeResult(model, "chat/stream", False, latency, str(exc))
+    latency = time.perf_counter() - start
 
     if bad > 0:
         return ProbeResult(
@@ -287,34 +522,19 @@ def run_chat_stream(
             latency,
             f"expected 1 [DONE] marker, got {done}",
         )
-    return ProbeResult(model, "chat/stream", True, latency, f"ok ({len(frames)} frame(s))")
+    return ProbeResult(model, "chat/stream", True, latency, f"ok ({frames} frame(s))")
 
 
-def run_responses_nonstream(
-    base_url: str,
+async def run_responses_nonstream(
+    session: aiohttp.ClientSession,
+    url: str,
     model: str,
-    api_key: str,
-    timeout_s: int,
-    prompt: str,
-    max_tokens: int,
+    settings: ProbeSettings,
 ) -> ProbeResult:
-    url = f"{base_url.rstrip('/')}/v1/responses"
-    payload = {
-        "model": model,
-        "input": [
-            {
-                "type": "message",
-                "role": "user",
-                "content": [{"type": "input_text", "text": prompt}],
-            }
-        ],
-        "max_output_tokens": max_tokens,
-        "stream": False,
-    }
-    start = time.time()
-    status, body, stderr = run_curl(
-        url, payload, api_key, timeout_s, streaming=False)
-    latency = time.time() - start
+    payload = build_responses_payload(model, settings, stream=False)
+    start = time.perf_counter()
+    status, body, stderr = await http_post(session, url, payload, settings.api_key)
+    latency = time.perf_counter() - start
 
     if status != 200:
         msg = stderr.strip() or body[:220]
@@ -348,63 +568,49 @@ def run_responses_nonstream(
     return ProbeResult(model, "responses/non-stream", True, latency, "ok")
 
 
-def run_responses_stream(
-    base_url: str,
+async def run_responses_stream(
+    session: aiohttp.ClientSession,
+    url: str,
     model: str,
-    api_key: str,
-    timeout_s: int,
-    prompt: str,
-    max_tokens: int,
+    settings: ProbeSettings,
 ) -> ProbeResult:
-    url = f"{base_url.rstrip('/')}/v1/responses"
-    payload = {
-        "model": model,
-        "input": [
-            {
-                "type": "message",
-                "role": "user",
-                "content": [{"type": "input_text", "text": prompt}],
-            }
-        ],
-        "max_output_tokens": max_tokens,
-        "stream": True,
-    }
-    start = time.time()
-    status, body, stderr = run_curl(
-        url, payload, api_key, timeout_s, streaming=True)
-    latency = time.time() - start
-
-    if status != 200:
-        msg = stderr.strip() or body[:220]
+    payload = build_responses_payload(model, settings, stream=True)
+    frames = 0
+    bad = 0
+    completed = 0
+    failed = 0
+    start = time.perf_counter()
+    try:
+        async with aclosing(http_post_sse(session, url, payload, settings.api_key)) as stream:
+            async for data in stream:
+                frames += 1
+                if not data:
+                    continue
+                if data.strip() == b"[DONE]":
+                    # Responses stream should not emit [DONE], but tolerate it if present.
+                    continue
+                try:
+                    parsed = orjson.loads(data)
+                except ValueError:
+                    bad += 1
+                    continue
+                event_type = parsed.get("type")
+                if event_type == "response.completed":
+                    # Terminal event seen: stop reading rather than wait for close.
+                    completed += 1
+                    break
+                if event_type == "response.failed":
+                    failed += 1
+    except ProbeHttpError as exc:
+        latency = time.perf_counter() - start
         return ProbeResult(
             model,
             "responses/stream",
             False,
             latency,
-            f"HTTP {status}: {msg}",
+            str(exc),
         )
-
-    frames = parse_sse_frames(body)
-    bad = 0
-    completed = 0
-    failed = 0
-    for frame in frames:
-        data = parse_sse_data(frame)
-        if not data:
-            continue
-        if data.strip() == "[DONE]":
-            # Responses stream should not emit [DONE], but tolerate it if present.
-            continue
-        try:
-            parsed = json.loads(data)
-        except json.JSONDecodeError:
-            bad += 1
-            continue
-        event_type = parsed.get("type")
-        if event_type == "response.completed":
-            completed += 1
-        if event_type == "response.failed":
-            failed += 1
+    latency = time.perf_counter() - start
 
     if bad > 0:
         return ProbeResult(
@@ -436,101 +642,178 @@ def run_responses_stream(
         "responses/stream",
         True,
         latency,
-        f"ok ({len(frames)} frame(s))",
+        f"ok ({frames} frame(s))",
     )
 
 
-def parse_models_arg(raw: str) -> list[str]:
+ProbeFn = Callable[[aiohttp.ClientSession, str, str, ProbeSettings], Awaitable[ProbeResult]]
+
+CHAT_PATH = "/v1/chat/completions"
+RESPONSES_PATH = "/v1/responses"
+
+# Every case in the matrix, in report order, with the endpoint it probes.
+# Each probe runs once per route.
+PROBES: list[tuple[str, str, ProbeFn]] = [
+    ("chat/non-stream", CHAT_PATH, run_chat_nonstream),
+    ("chat/stream", CHAT_PATH, run_chat_stream),
+    ("responses/non-stream", RESPONSES_PATH, run_responses_nonstream),
+    ("responses/stream", RESPONSES_PATH, run_responses_stream),
+]
+PROBE_CASES = tuple(case for case, _, _ in PROBES)
+
+
+def parse_shard_arg(raw: str) -> tuple[int, int]:
+    """Parse --shard "i/N" (1-based) into (index, count)."""
+    try:
+        index_str, count_str = raw.split("/", 1)
+        index, count = int(index_str), int(count_str)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {raw!r}") from None
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {raw!r} out of range (need 1 <= i <= N)")
+    return index, count
+
+
+def parse_cases_arg(raw: str) -> frozenset[str]:
+    """Parse --cases into a set of known case names."""
+    cases = frozenset(token.strip() for token in raw.split(",") if token.strip())
+    unknown = sorted(cases.difference(PROBE_CASES))
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown case(s) {', '.join(unknown)} (choose from {', '.join(PROBE_CASES)})"
+        )
+    if not cases:
+        raise argparse.ArgumentTypeError("expected at least one case")
+    return cases
+
+
+@functools.lru_cache(maxsize=8)
+def parse_models_arg(raw: str) -> tuple[str, ...]:
     if not raw.strip():
-        return []
+        return ()
     models = []
     for token in raw.split(";"):
         model = token.strip()
         if model:
             models.append(model)
-    return models
-
-
-def print_results(results: Iterable[ProbeResult], verbose: bool) -> int:
-    failures = 0
-    for result in results:
-        status = "PASS" if result.ok else "FAIL"
-        if not result.ok:
-            failures += 1
-        print(
-            f"[{status}] model={result.model} case={result.case} "
-            f"latency={result.latency_s:.3f}s detail={result.detail}"
-        )
-        if verbose and result.ok:
-            print(f"       verified {result.case} for {result.model}")
-    return failures
+    return tuple(models)
 
 
-def main() -> int:
-    args = build_parser().parse_args()
+def print_result(result: ProbeResult, verbose: bool) -> None:
+    status = "PASS" if result.ok else "FAIL"
+    print(
+        f"[{status}] model={result.model} case={result.case} "
+        f"latency={result.latency_s:.3f}s detail={result.detail}",
+        flush=True,
+    )
+    if verbose and result.ok:
+        print(f"       verified {result.case} for {result.model}", flush=True)
+
+
+async def run_matrix(args: argparse.Namespace) -> int:
     base_url = args.base_url.rstrip("/")
 
-    models = parse_models_arg(args.models)
-    if not models:
-        models = discover_models(base_url, args.api_key, args.timeout)
-
-    if not models:
-        print("No provider routes discovered (expected ids like provider,model).", file=sys.stderr)
-        return 2
-
-    print(f"Discovered {len(models)} route(s): {', '.join(models)}")
-
-    results: list[ProbeResult] = []
-    for model in models:
-        results.append(
-            run_chat_nonstream(
-                base_url,
-                model,
-                args.api_key,
-                args.timeout,
-                args.prompt,
-                args.max_output_tokens,
-                args.temperature,
-            )
-        )
-        results.append(
-            run_chat_stream(
-                base_url,
-                model,
-                args.api_key,
-                args.timeout,
-                args.prompt,
-                args.max_output_tokens,
-                args.temperature,
-            )
-        )
-        results.append(
-            run_responses_nonstream(
-                base_url,
-                model,
-                args.api_key,
-                args.timeout,
-                args.prompt,
-                args.max_output_tokens,
-            )
-        )
-        results.append(
-            run_responses_stream(
-                base_url,
-                model,
-                args.api_key,
-                args.timeout,
-                args.prompt,
-                args.max_output_tokens,
-            )
+    # One keep-alive pool for the whole matrix: CCR is a single host, so every
+    # probe after the first reuses an open connection instead of reconnecting.
+    # CCR serves HTTP/1.1 only (no multiplexing), so each in-flight probe holds
+    # one socket; the pool is sized to the semaphore so no spares are opened.
+    concurrency = max(args.concurrency, 1)
+    connector = aiohttp.TCPConnector(
+        limit=concurrency,
+        limit_per_host=concurrency,
+        keepalive_timeout=args.timeout,
+    )
+    async with aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=args.timeout),
+    ) as session:
+        models = parse_models_arg(args.models)
+        fetched = False
+        if models:
+            print(f"Using {len(models)} route(s) from --models: {', '.join(models)}")
+        else:
+            ttl_s = 0.0 if args.refresh_models else MODELS_CACHE_TTL_S
+            models, cache_age = await discover_models_cached(session, base_url, args.api_key, ttl_s)
+            if not models:
+                print("No provider routes discovered (expected ids like provider,model).", file=sys.stderr)
+                return 2
+            fetched = cache_age is None
+            if fetched:
+                print(f"Discovered {len(models)} route(s): {', '.join(models)}")
+            else:
+                print(
+                    f"Using {len(models)} cached route(s) (age {format_age(cache_age)}; "
+                    f"--refresh-models to rediscover): {', '.join(models)}"
+                )
+
+        if not fetched:
+            # Discovery already left a live connection in the pool; otherwise
+            # open one now so handshake cost stays out of the first probe.
+            await warm_connection(session, base_url, args.api_key)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(model: str, case: str, url: str, probe: ProbeFn) -> ProbeResult:
+            async with semaphore:
+                try:
+                    return await probe(session, url, model, settings)
+                except Exception as exc:
+                    return ProbeResult(model, case, False, 0.0, f"{type(exc).__name__}: {exc}")
+
+        settings = ProbeSettings(
+            api_key=args.api_key,
+            prompt=args.prompt,
+            max_tokens=args.max_output_tokens,
+            temperature=args.temperature,
         )
-
-    failures = print_results(results, args.verbose)
-    passed = len(results) - failures
-    print(f"Summary: {passed}/{len(results)} checks passed")
+        # Endpoint URLs are built once per run, not once per probe.
+        probes = [
+            (case, f"{base_url}{path}", probe)
+            for case, path, probe in PROBES
+            if case in args.cases
+        ]
+        cases = [(model, case, url, probe) for model in models for case, url, probe in probes]
+        if args.shard:
+            # Contiguous near-equal blocks of the route-major matrix: shards keep
+            # whole routes together where they can, and sizes differ by at most one.
+            index, count = args.shard
+            total = len(cases)
+            cases = cases[(index - 1) * total // count:index * total // count]
+            if not cases:
+                print(f"Shard {index}/{count} is empty (the matrix has {total} check(s)).")
+        tasks = [asyncio.create_task(bounded(*entry)) for entry in cases]
+
+        # Report each probe as soon as it finishes rather than after the matrix.
+        finished = 0
+        failures = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                finished += 1
+                print_result(result, args.verbose)
+                if not result.ok:
+                    failures += 1
+                    if args.fail_fast:
+                        break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    passed = finished - failures
+    skipped = len(tasks) - finished
+    summary = f"Summary: {passed}/{len(tasks)} checks passed"
+    if skipped:
+        summary += f" ({skipped} skipped by --fail-fast)"
+    print(summary)
 
     return 0 if failures == 0 else 1
 
 
+def main() -> int:
+    args = build_parser().parse_args()
+    return asyncio.run(run_matrix(args))
+
+
 if __name__ == "__main__":
     sys.exit(main())